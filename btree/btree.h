@@ -15,14 +15,19 @@
 #ifndef PYBTREE_BTREE_H_
 #define PYBTREE_BTREE_H_
 
+#include <algorithm>
 #include <concepts>
 #include <cstddef>
 #include <functional>
 #include <iterator>
+#include <memory>
+#include <numeric>
+#include <optional>
 #include <string>
 #include <tuple>
 #include <type_traits>
 #include <utility>
+#include <vector>
 
 // It is recommended to always define `PY_SSIZE_T_CLEAN` before including
 // Python.h. See also: https://docs.python.org/3/c-api/intro.html#include-files
@@ -53,8 +58,59 @@ using less = std::less<Args...>;
 
 namespace djc::btree {
 
+// Overrides the target size in bytes of the nodes of the underlying absl btree,
+// which is 256 by default. It is passed in place of the comparator of maps,
+// e.g. `btree_map<int, int, target_node_size<less<int>, 512>>`. Larger nodes
+// take fewer cache misses to descend, but more comparisons to search.
+template <typename Compare, int TargetNodeSize>
+struct target_node_size {};
+
 namespace btree_internal {
 
+template <typename Key, typename Data, typename Compare, bool IsMulti>
+struct absl_btree_map_selector {
+  using type =
+      std::conditional_t<IsMulti, absl::btree_multimap<Key, Data, Compare>,
+                         absl::btree_map<Key, Data, Compare>>;
+};
+
+// There is no public interface to customize the node size in absl, so the
+// internal containers are used here the same way as absl does.
+template <typename Key, typename Data, typename Compare, int TargetNodeSize,
+          bool IsMulti>
+struct absl_btree_map_selector<
+    Key, Data, target_node_size<Compare, TargetNodeSize>, IsMulti> {
+  using params_type = absl::container_internal::map_params<
+      Key, Data, Compare, std::allocator<std::pair<const Key, Data>>,
+      TargetNodeSize, IsMulti>;
+  using tree_type = absl::container_internal::btree<params_type>;
+  using type = std::conditional_t<
+      IsMulti, absl::container_internal::btree_multimap_container<tree_type>,
+      absl::container_internal::btree_map_container<tree_type>>;
+};
+
+template <typename Key, typename Data, typename Compare>
+using absl_btree_map =
+    absl_btree_map_selector<Key, Data, Compare, /*IsMulti=*/false>::type;
+
+template <typename Key, typename Data, typename Compare>
+using absl_btree_multimap =
+    absl_btree_map_selector<Key, Data, Compare, /*IsMulti=*/true>::type;
+
+template <typename key_type, typename mapped_type, typename Iterator>
+void inc_ref_for_iterator(Iterator it) {
+  if constexpr (std::is_same_v<key_type, PyObject*>) {
+    if constexpr (std::is_void_v<mapped_type>) {
+      Py_INCREF(*it);
+    } else {
+      Py_INCREF(it->first);
+    }
+  }
+  if constexpr (std::is_same_v<mapped_type, PyObject*>) {
+    Py_INCREF(it->second);
+  }
+}
+
 template <typename key_type, typename mapped_type, typename Iterator>
 void dec_ref_for_iterator(Iterator it) {
   if constexpr (std::is_same_v<key_type, PyObject*>) {
@@ -78,8 +134,10 @@ class btree_container_iterator {
   Iterator* iterator() {
     // Static cast is not allowed here because this class is not the "actual"
     // base class of `Iterator`. Reinterpret cast is safe because the derived
-    // classes of this abstract class do not introduce any member variables nor
-    // virtual functions. The two classes should have the same memory layout.
+    // classes inherit from `Iterator` first and from this empty class second,
+    // without virtual functions, so both bases are placed at offset 0 of the
+    // derived object. Their own members (e.g. `btree_`) follow the bases and
+    // must not be moved before them.
     return reinterpret_cast<Iterator*>(this);
   }
 
@@ -134,6 +192,20 @@ class btree_container_iterator {
     return **iterator();
   }
 
+  bool at_end() { return *iterator() == derived()->btree()->end(); }
+
+  // Fuses `operator*` and `operator++`. Returns `std::nullopt` at the end.
+  // It is not exposed to Python for `object` elements, where a stored `None`
+  // would be indistinguishable from the end.
+  std::optional<value_type> next_value() {
+    if (at_end()) {
+      return std::nullopt;
+    }
+    std::optional<value_type> value(**this);
+    ++*iterator();
+    return value;
+  }
+
   bool operator==(const btree_container_iterator&) const = default;
 
   bool operator!=(const btree_container_iterator&) const = default;
@@ -156,7 +228,8 @@ class btree_set_iterator
   using btree_type = absl::btree_set<Key, Compare>;
   using iterator = btree_type::iterator;
 
-  explicit btree_set_iterator(iterator it) : iterator(it) {}
+  explicit btree_set_iterator(iterator it, const btree_type* btree)
+      : iterator(it), btree_(btree) {}
 
   using base_type::operator++;
   using base_type::operator--;
@@ -165,6 +238,12 @@ class btree_set_iterator
   bool operator==(const btree_set_iterator& rhs) const = default;
 
   bool operator!=(const btree_set_iterator& rhs) const = default;
+
+  // Returns the btree that the iterator belongs to.
+  const btree_type* btree() const { return btree_; }
+
+ private:
+  const btree_type* btree_;
 };
 
 template <typename Key, typename Compare>
@@ -182,7 +261,8 @@ class btree_multiset_iterator
   using btree_type = absl::btree_multiset<Key, Compare>;
   using iterator = btree_type::iterator;
 
-  explicit btree_multiset_iterator(iterator it) : iterator(it) {}
+  explicit btree_multiset_iterator(iterator it, const btree_type* btree)
+      : iterator(it), btree_(btree) {}
 
   using base_type::operator++;
   using base_type::operator--;
@@ -191,24 +271,33 @@ class btree_multiset_iterator
   bool operator==(const btree_multiset_iterator& rhs) const = default;
 
   bool operator!=(const btree_multiset_iterator& rhs) const = default;
+
+  // Returns the btree that the iterator belongs to.
+  const btree_type* btree() const { return btree_; }
+
+ private:
+  const btree_type* btree_;
 };
 
 template <typename Key, typename Data, typename Compare>
 class btree_map_iterator
-    : public absl::btree_map<Key, Data, Compare>::iterator,
+    : public btree_internal::absl_btree_map<Key, Data, Compare>::iterator,
       public btree_internal::btree_container_iterator<
           btree_map_iterator<Key, Data, Compare>,
-          typename absl::btree_map<Key, Data, Compare>::iterator, Key, Data> {
+          typename btree_internal::absl_btree_map<Key, Data, Compare>::iterator,
+          Key, Data> {
  private:
   using base_type = btree_internal::btree_container_iterator<
       btree_map_iterator<Key, Data, Compare>,
-      typename absl::btree_map<Key, Data, Compare>::iterator, Key, Data>;
+      typename btree_internal::absl_btree_map<Key, Data, Compare>::iterator,
+      Key, Data>;
 
  public:
-  using btree_type = absl::btree_map<Key, Data, Compare>;
+  using btree_type = btree_internal::absl_btree_map<Key, Data, Compare>;
   using iterator = btree_type::iterator;
 
-  explicit btree_map_iterator(iterator it) : iterator(it) {}
+  explicit btree_map_iterator(iterator it, const btree_type* btree)
+      : iterator(it), btree_(btree) {}
 
   using base_type::operator++;
   using base_type::operator--;
@@ -217,25 +306,35 @@ class btree_map_iterator
   bool operator==(const btree_map_iterator&) const = default;
 
   bool operator!=(const btree_map_iterator&) const = default;
+
+  // Returns the btree that the iterator belongs to.
+  const btree_type* btree() const { return btree_; }
+
+ private:
+  const btree_type* btree_;
 };
 
 template <typename Key, typename Data, typename Compare>
 class btree_multimap_iterator
-    : public absl::btree_multimap<Key, Data, Compare>::iterator,
+    : public btree_internal::absl_btree_multimap<Key, Data, Compare>::iterator,
       public btree_internal::btree_container_iterator<
           btree_multimap_iterator<Key, Data, Compare>,
-          typename absl::btree_multimap<Key, Data, Compare>::iterator, Key,
-          Data> {
+          typename btree_internal::absl_btree_multimap<Key, Data,
+                                                       Compare>::iterator,
+          Key, Data> {
  private:
   using base_type = btree_internal::btree_container_iterator<
       btree_multimap_iterator<Key, Data, Compare>,
-      typename absl::btree_multimap<Key, Data, Compare>::iterator, Key, Data>;
+      typename btree_internal::absl_btree_multimap<Key, Data,
+                                                   Compare>::iterator,
+      Key, Data>;
 
  public:
-  using btree_type = absl::btree_multimap<Key, Data, Compare>;
+  using btree_type = btree_internal::absl_btree_multimap<Key, Data, Compare>;
   using iterator = btree_type::iterator;
 
-  explicit btree_multimap_iterator(iterator it) : iterator(it) {}
+  explicit btree_multimap_iterator(iterator it, const btree_type* btree)
+      : iterator(it), btree_(btree) {}
 
   using base_type::operator++;
   using base_type::operator--;
@@ -244,6 +343,12 @@ class btree_multimap_iterator
   bool operator==(const btree_multimap_iterator&) const = default;
 
   bool operator!=(const btree_multimap_iterator&) const = default;
+
+  // Returns the btree that the iterator belongs to.
+  const btree_type* btree() const { return btree_; }
+
+ private:
+  const btree_type* btree_;
 };
 
 namespace btree_internal {
@@ -451,9 +556,9 @@ class btree_container {
  public:
   bool not_empty() { return !btree()->empty(); }
 
-  iterator _begin() { return iterator(btree()->begin()); }
+  iterator _begin() { return iterator(btree()->begin(), btree()); }
 
-  iterator _end() { return iterator(btree()->end()); }
+  iterator _end() { return iterator(btree()->end(), btree()); }
 
   keys_view begin() { return keys_view(_begin()); }
 
@@ -462,14 +567,16 @@ class btree_container {
   // Avoid heterogeneous lookup since Python does not support overloads.
   bool _contains(key_arg_type key) { return btree()->contains(key); }
 
-  iterator _find(key_arg_type key) { return iterator(btree()->find(key)); }
+  iterator _find(key_arg_type key) {
+    return iterator(btree()->find(key), btree());
+  }
 
   iterator _lower_bound(key_arg_type key) {
-    return iterator(btree()->lower_bound(key));
+    return iterator(btree()->lower_bound(key), btree());
   }
 
   iterator _upper_bound(key_arg_type key) {
-    return iterator(btree()->upper_bound(key));
+    return iterator(btree()->upper_bound(key), btree());
   }
 
   std::pair<iterator, bool> _insert(value_arg_type value) {
@@ -486,7 +593,7 @@ class btree_container {
         Py_INCREF(it->second);
       }
     }
-    return std::make_pair(iterator(it), inserted);
+    return std::make_pair(iterator(it, btree()), inserted);
   }
 
   size_type _erase(key_arg_type key) {
@@ -511,7 +618,73 @@ class btree_container {
       gil_guard<> _;
       btree_internal::dec_ref_for_iterator<key_type, mapped_type>(it);
     }
-    return iterator(btree()->erase(static_cast<btree_type::iterator>(it)));
+    return iterator(btree()->erase(static_cast<btree_type::iterator>(it)),
+                    btree());
+  }
+
+  // Returns at most `n` elements starting from `it`, and advances `it` past
+  // them. An iteration over the whole btree only crosses the boundary between
+  // Python and C++ once per chunk instead of twice per element.
+  std::vector<value_type> iter_chunk(iterator* it, size_type n) {
+    gil_guard<std::is_same_v<key_type, PyObject*> ||
+              std::is_same_v<mapped_type, PyObject*>>
+        _;
+    std::vector<value_type> chunk;
+    // An iterator of another btree would never reach the end of this one.
+    if (it->btree() != btree()) {
+      return chunk;
+    }
+    auto& pos = static_cast<typename btree_type::iterator&>(*it);
+    chunk.reserve(std::min(n, btree()->size()));
+    for (auto end = btree()->end(); pos != end && chunk.size() < n; ++pos) {
+      btree_internal::inc_ref_for_iterator<key_type, mapped_type>(pos);
+      chunk.push_back(*pos);
+    }
+    return chunk;
+  }
+
+  // Returns all elements in order. Unlike iterating via `__iter__`, it also
+  // works on `object`.
+  std::vector<value_type> items_list() {
+    auto it = _begin();
+    return iter_chunk(&it, btree()->size());
+  }
+
+  // Returns all keys in order.
+  std::vector<key_type> keys_list() {
+    gil_guard<std::is_same_v<key_type, PyObject*>> _;
+    std::vector<key_type> keys;
+    keys.reserve(btree()->size());
+    for (auto it = btree()->begin(); it != btree()->end(); ++it) {
+      if constexpr (std::is_void_v<mapped_type>) {
+        keys.push_back(*it);
+      } else {
+        keys.push_back(it->first);
+      }
+      if constexpr (std::is_same_v<key_type, PyObject*>) {
+        Py_INCREF(keys.back());
+      }
+    }
+    return keys;
+  }
+
+  // Returns all keys and all values in order as two separate lists, which
+  // avoids creating a tuple per element in Python.
+  std::pair<std::vector<key_type>, std::vector<mapped_type>> keys_and_values()
+    requires(!std::is_void_v<mapped_type>)
+  {
+    gil_guard<std::is_same_v<key_type, PyObject*> ||
+              std::is_same_v<mapped_type, PyObject*>>
+        _;
+    std::pair<std::vector<key_type>, std::vector<mapped_type>> result;
+    result.first.reserve(btree()->size());
+    result.second.reserve(btree()->size());
+    for (auto it = btree()->begin(); it != btree()->end(); ++it) {
+      btree_internal::inc_ref_for_iterator<key_type, mapped_type>(it);
+      result.first.push_back(it->first);
+      result.second.push_back(it->second);
+    }
+    return result;
   }
 
   void _clear() {
@@ -576,7 +749,7 @@ class btree_multi_container : public btree_container<Btree, KeyView> {
     if constexpr (std::is_same_v<mapped_type, PyObject*>) {
       Py_INCREF(value.second);
     }
-    return iterator(btree()->insert(value));
+    return iterator(btree()->insert(value), btree());
   }
 
   size_type _erase(key_arg_type key) {
@@ -607,6 +780,12 @@ class pyobject_cmp {
   }
 };
 
+// Arithmetic keys are compared via `std::less`, with which absl searches them
+// within a node linearly instead of binary search. That is more friendly to
+// branch prediction and prefetching at the default node size. Replacing it by a
+// custom functor loses the linear search unless the functor opts into it via
+// `absl_btree_prefer_linear_node_search`. For other keys (e.g. `std::string`,
+// pairs and tuples), absl always uses binary search regardless of `std::less`.
 template <typename Key>
 using default_comparator =
     std::conditional_t<std::is_same_v<std::remove_cv_t<Key>, PyObject*>,
@@ -675,12 +854,12 @@ class btree_multiset : public absl::btree_multiset<Key, Compare>,
 
 template <typename Key, typename Data,
           typename Compare = btree_internal::default_comparator<Key>>
-class btree_map : public absl::btree_map<Key, Data, Compare>,
+class btree_map : public btree_internal::absl_btree_map<Key, Data, Compare>,
                   public btree_internal::btree_container<
-                      absl::btree_map<Key, Data, Compare>,
+                      btree_internal::absl_btree_map<Key, Data, Compare>,
                       btree_map_keys_view<Key, Data, Compare>> {
  public:
-  using btree_type = absl::btree_map<Key, Data, Compare>;
+  using btree_type = btree_internal::absl_btree_map<Key, Data, Compare>;
   using key_type = btree_type::key_type;
   using mapped_type = btree_type::mapped_type;
   using value_type = btree_type::value_type;
@@ -689,9 +868,9 @@ class btree_map : public absl::btree_map<Key, Data, Compare>,
   using iterator = keys_view::iterator;
 
  private:
-  using btree_container =
-      btree_internal::btree_container<absl::btree_map<Key, Data, Compare>,
-                                      btree_map_keys_view<Key, Data, Compare>>;
+  using btree_container = btree_internal::btree_container<
+      btree_internal::absl_btree_map<Key, Data, Compare>,
+      btree_map_keys_view<Key, Data, Compare>>;
   using key_arg_type = std::conditional_t<std::is_pointer_v<key_type>, key_type,
                                           const key_type&>;
   using mapped_arg_type = std::conditional_t<std::is_pointer_v<mapped_type>,
@@ -731,7 +910,54 @@ class btree_map : public absl::btree_map<Key, Data, Compare>,
       }
       it->second = data;
     }
-    return std::make_pair(iterator(it), inserted);
+    return std::make_pair(iterator(it, this), inserted);
+  }
+
+  // The same as `insert_or_assign`, but takes amortized constant time instead
+  // of descending from the root if the key belongs right before or after
+  // `hint`. Returns the iterator to the inserted or assigned pair, which is
+  // also the best hint for the next larger key. A `hint` of another btree is
+  // ignored.
+  iterator insert_hint(iterator hint, key_arg_type key, mapped_arg_type data) {
+    if constexpr (std::is_same_v<mapped_type, PyObject*>) {
+      Py_INCREF(data);
+    }
+    auto pos = hint.btree() == this
+                   ? static_cast<typename btree_type::iterator>(hint)
+                   : btree_type::end();
+    size_type old_size = btree_type::size();
+    auto it = btree_type::try_emplace(pos, key, data);
+    if (btree_type::size() != old_size) {
+      if constexpr (std::is_same_v<key_type, PyObject*>) {
+        Py_INCREF(key);
+      }
+    } else {
+      if constexpr (std::is_same_v<mapped_type, PyObject*>) {
+        Py_DECREF(it->second);
+      }
+      it->second = data;
+    }
+    return iterator(it, this);
+  }
+
+  // Inserts the keys and values pairwise. The keys are expected to be sorted in
+  // ascending order, so that every pair is inserted via `insert_hint` in
+  // amortized constant time. Unsorted keys are still inserted correctly, just
+  // slower. For duplicate keys, the last value wins, the same as `__setitem__`.
+  // Raises `ValueError` without inserting anything if the numbers of keys and
+  // values differ.
+  void build_from_sorted(const std::vector<key_type>& keys,
+                         const std::vector<mapped_type>& values) {
+    if (keys.size() != values.size()) {
+      gil_guard<> _;
+      PyErr_SetString(PyExc_ValueError,
+                      "The numbers of keys and values are different.");
+      return;
+    }
+    auto hint = btree_container::_end();
+    for (size_type i = 0; i < keys.size(); ++i) {
+      hint = insert_hint(hint, keys[i], values[i]);
+    }
   }
 
   mapped_type get_item(key_arg_type key) {
@@ -753,16 +979,73 @@ class btree_map : public absl::btree_map<Key, Data, Compare>,
     }
     return it->second;
   }
+
+  // Equivalent to `[tree[key] for key in keys]` in Python, but crosses the
+  // boundary between Python and C++ only once.
+  std::vector<mapped_type> find_many(const std::vector<key_type>& keys) {
+    std::vector<mapped_type> values(keys.size());
+    for (size_type i : lookup_order(keys)) {
+      values[i] = get_item(keys[i]);
+    }
+    return values;
+  }
+
+  // Returns the pair with the smallest key larger than each of the given keys,
+  // or `std::nullopt` if there is no such pair.
+  std::vector<std::optional<value_type>> upper_bound_many(
+      const std::vector<key_type>& keys) {
+    gil_guard<std::is_same_v<key_type, PyObject*> ||
+              std::is_same_v<mapped_type, PyObject*>>
+        _;
+    std::vector<std::optional<value_type>> values(keys.size());
+    for (size_type i : lookup_order(keys)) {
+      if (auto it = btree_type::upper_bound(keys[i]);
+          it != btree_type::end()) {
+        btree_internal::inc_ref_for_iterator<key_type, mapped_type>(it);
+        values[i].emplace(*it);
+      }
+    }
+    return values;
+  }
+
+  // Erases the given keys and returns the number of erased pairs. Just like
+  // lookups, erasing in ascending order of keys mostly touches cached nodes.
+  size_type erase_many(const std::vector<key_type>& keys) {
+    size_type erased_count = 0;
+    for (size_type i : lookup_order(keys)) {
+      erased_count += btree_container::_erase(keys[i]);
+    }
+    return erased_count;
+  }
+
+ private:
+  // Returns the order to look up the given keys in. Lookups in ascending order
+  // of keys descend along mostly the same paths, whose nodes are still cached,
+  // rather than missing the cache on almost every level of a large btree.
+  // Object keys are looked up as is, since comparing them costs more than the
+  // cache misses saved.
+  std::vector<size_type> lookup_order(const std::vector<key_type>& keys) {
+    std::vector<size_type> order(keys.size());
+    std::iota(order.begin(), order.end(), 0);
+    if constexpr (!std::is_same_v<key_type, PyObject*>) {
+      auto comp = btree_type::key_comp();
+      std::sort(order.begin(), order.end(), [&](size_type lhs, size_type rhs) {
+        return comp(keys[lhs], keys[rhs]);
+      });
+    }
+    return order;
+  }
 };
 
 template <typename Key, typename Data,
           typename Compare = btree_internal::default_comparator<Key>>
-class btree_multimap : public absl::btree_multimap<Key, Data, Compare>,
-                       public btree_internal::btree_multi_container<
-                           absl::btree_multimap<Key, Data, Compare>,
-                           btree_multimap_keys_view<Key, Data, Compare>> {
+class btree_multimap
+    : public btree_internal::absl_btree_multimap<Key, Data, Compare>,
+      public btree_internal::btree_multi_container<
+          btree_internal::absl_btree_multimap<Key, Data, Compare>,
+          btree_multimap_keys_view<Key, Data, Compare>> {
  public:
-  using btree_type = absl::btree_multimap<Key, Data, Compare>;
+  using btree_type = btree_internal::absl_btree_multimap<Key, Data, Compare>;
   using key_type = btree_type::key_type;
   using mapped_type = btree_type::mapped_type;
   using value_type = btree_type::value_type;
@@ -772,7 +1055,7 @@ class btree_multimap : public absl::btree_multimap<Key, Data, Compare>,
 
  private:
   using btree_container = btree_internal::btree_multi_container<
-      absl::btree_multimap<Key, Data, Compare>,
+      btree_internal::absl_btree_multimap<Key, Data, Compare>,
       btree_multimap_keys_view<Key, Data, Compare>>;
 
  public:
@@ -137,6 +137,7 @@ class BtreeTest(parameterized.TestCase):
     tree.clear()
     self.assertEmpty(tree)
     self.assertEqual(tree.begin(), tree.end())
+    self.assertTrue(tree.begin().at_end())
 
   @parameterized.named_parameters(
       dict(testcase_name='int', btree_type=btree.BtreeMultisetInt, f=int),
@@ -201,6 +202,12 @@ class BtreeTest(parameterized.TestCase):
           f=int,
           g=int,
       ),
+      dict(
+          testcase_name='int_to_int_node_size_128',
+          btree_type=btree.BtreeMapInt2IntNodeSize128,
+          f=int,
+          g=int,
+      ),
       dict(
           testcase_name='int_to_str',
           btree_type=btree.BtreeMapInt2Str,
@@ -315,6 +322,188 @@ class BtreeTest(parameterized.TestCase):
     self.assertEmpty(tree)
     self.assertEqual(tree.begin(), tree.end())
 
+  @parameterized.named_parameters(
+      dict(testcase_name='int', btree_type=btree.BtreeSetInt),
+      dict(testcase_name='object', btree_type=btree.BtreeMultisetObject),
+  )
+  def test_iter_chunk(self, btree_type: type[Any]):
+    tree = btree_type()
+    for key in range(10):
+      tree.insert(key)
+
+    it = tree.begin()
+    self.assertListEqual(tree.iter_chunk(it, 4), [0, 1, 2, 3])
+    self.assertEqual(it.deref(), 4)
+    self.assertListEqual(tree.iter_chunk(it, 4), [4, 5, 6, 7])
+    self.assertFalse(it.at_end())
+    self.assertListEqual(tree.iter_chunk(it, 4), [8, 9])
+    self.assertEqual(it, tree.end())
+    self.assertTrue(it.at_end())
+    self.assertListEqual(tree.iter_chunk(it, 4), [])
+
+    # Iterators of other btrees are rejected.
+    self.assertListEqual(tree.iter_chunk(btree_type().begin(), 4), [])
+    other = btree_type()
+    other.insert(0)
+    self.assertListEqual(tree.iter_chunk(other.begin(), 4), [])
+
+  @parameterized.named_parameters(
+      dict(testcase_name='set', btree_type=btree.BtreeSetInt, f=int),
+      dict(
+          testcase_name='multiset', btree_type=btree.BtreeMultisetStr, f=str
+      ),
+  )
+  def test_next_value(self, btree_type: type[Any], f: Callable[[int], Any]):
+    tree = btree_type()
+    self.assertIsNone(tree.begin().next_value())
+    for key in (9, 8, 8):
+      tree.insert(f(key))
+
+    it = tree.begin()
+    self.assertEqual(it.next_value(), f(8))
+    self.assertFalse(it.at_end())
+    if btree_type is btree.BtreeMultisetStr:
+      self.assertEqual(it.next_value(), f(8))
+    self.assertEqual(it.next_value(), f(9))
+    self.assertIsNone(it.next_value())
+    self.assertTrue(it.at_end())
+
+    # A stored `None` would be indistinguishable from the end.
+    self.assertFalse(hasattr(btree.BtreeSetObject().begin(), 'next_value'))
+    self.assertFalse(
+        hasattr(btree.BtreeMultisetObject().begin(), 'next_value')
+    )
+
+  @parameterized.named_parameters(
+      dict(testcase_name='int_to_int', btree_type=btree.BtreeMapInt2Int),
+      dict(testcase_name='int_to_object', btree_type=btree.BtreeMapInt2Object),
+      dict(
+          testcase_name='object_to_object',
+          btree_type=btree.BtreeMapObject2Object,
+      ),
+  )
+  def test_btree_map_next_value(self, btree_type: type[Any]):
+    tree = btree_type()
+    self.assertIsNone(tree.begin().next_value())
+    tree[2] = 20
+    tree[1] = 10
+
+    it = tree.begin()
+    self.assertTupleEqual(it.next_value(), (1, 10))
+    self.assertTupleEqual(it.next_value(), (2, 20))
+    self.assertIsNone(it.next_value())
+    self.assertTrue(it.at_end())
+
+  def test_items_list(self):
+    tree = btree.BtreeMapObject2Object()
+    self.assertListEqual(tree.items_list(), [])
+    tree['b'] = [2]
+    tree['a'] = [1]
+    self.assertListEqual(tree.items_list(), [('a', [1]), ('b', [2])])
+
+  @parameterized.named_parameters(
+      dict(testcase_name='set', btree_type=btree.BtreeSetInt),
+      dict(testcase_name='multiset', btree_type=btree.BtreeMultisetObject),
+  )
+  def test_keys_list(self, btree_type: type[Any]):
+    tree = btree_type()
+    self.assertListEqual(tree.keys_list(), [])
+    for key in (3, 1, 2, 1):
+      tree.insert(key)
+    if btree_type is btree.BtreeMultisetObject:
+      self.assertListEqual(tree.keys_list(), [1, 1, 2, 3])
+    else:
+      self.assertListEqual(tree.keys_list(), [1, 2, 3])
+
+  @parameterized.named_parameters(
+      dict(testcase_name='int_to_int', btree_type=btree.BtreeMapInt2Int),
+      dict(
+          testcase_name='object_to_object',
+          btree_type=btree.BtreeMapObject2Object,
+      ),
+  )
+  def test_btree_map_keys_list(self, btree_type: type[Any]):
+    tree = btree_type()
+    self.assertListEqual(tree.keys_list(), [])
+    tree[3] = 30
+    tree[1] = 10
+    tree[2] = 20
+    self.assertListEqual(tree.keys_list(), [1, 2, 3])
+
+  @parameterized.named_parameters(
+      dict(testcase_name='int_to_int', btree_type=btree.BtreeMapInt2Int),
+      dict(testcase_name='int_to_object', btree_type=btree.BtreeMapInt2Object),
+      dict(
+          testcase_name='object_to_object',
+          btree_type=btree.BtreeMapObject2Object,
+      ),
+  )
+  def test_btree_map_keys_and_values(self, btree_type: type[Any]):
+    tree = btree_type()
+    self.assertTupleEqual(tree.keys_and_values(), ([], []))
+
+    tree[3] = 30
+    tree[1] = 10
+    tree[2] = 20
+    self.assertTupleEqual(tree.keys_and_values(), ([1, 2, 3], [10, 20, 30]))
+
+    del tree[2]
+    self.assertTupleEqual(tree.keys_and_values(), ([1, 3], [10, 30]))
+
+  @parameterized.named_parameters(
+      dict(testcase_name='int_to_int', btree_type=btree.BtreeMapInt2Int),
+      dict(testcase_name='int_to_object', btree_type=btree.BtreeMapInt2Object),
+  )
+  def test_btree_map_build_from_sorted(self, btree_type: type[Any]):
+    tree = btree_type()
+    tree[0] = 0
+    tree.build_from_sorted([1, 2, 2, 3], [10, 20, 21, 30])
+    self.assertLen(tree, 4)
+    self.assertEqual(tree[0], 0)
+    self.assertEqual(tree[1], 10)
+    self.assertEqual(tree[2], 21)
+    self.assertEqual(tree[3], 30)
+
+    # Mismatched lengths are rejected without inserting anything.
+    with self.assertRaises(ValueError):
+      tree.build_from_sorted([5, 4], [50])
+    with self.assertRaises(ValueError):
+      tree.build_from_sorted([5], [50, 40])
+    self.assertLen(tree, 4)
+
+    # Unsorted keys are supported as well.
+    tree.build_from_sorted([5, 4], [50, 40])
+    self.assertEqual(tree.begin().deref(), (0, 0))
+    self.assertEqual(tree.find(4).deref(), (4, 40))
+    self.assertEqual(tree.find(4).self_inc().deref(), (5, 50))
+
+    it = tree.insert_hint(tree.end(), 6, 60)
+    self.assertEqual(it.deref(), (6, 60))
+    it = tree.insert_hint(it, 6, 61)
+    self.assertEqual(it.deref(), (6, 61))
+    # A wrong hint still works.
+    self.assertEqual(tree.insert_hint(it, -1, -10), tree.begin())
+    self.assertLen(tree, 8)
+
+  @parameterized.named_parameters(
+      dict(testcase_name='int_to_int', btree_type=btree.BtreeMapInt2Int),
+      dict(testcase_name='int_to_object', btree_type=btree.BtreeMapInt2Object),
+  )
+  def test_btree_map_bulk_lookup(self, btree_type: type[Any]):
+    tree = btree_type()
+    tree.build_from_sorted([1, 3, 5], [10, 30, 50])
+    self.assertListEqual(tree.find_many([5, 1, 3]), [50, 10, 30])
+    self.assertListEqual(
+        tree.upper_bound_many([0, 3, 4, 5]), [(1, 10), (5, 50), (5, 50), None]
+    )
+
+    # Just like `__getitem__`, missing keys are inserted with default values.
+    self.assertLen(tree.find_many([2]), 1)
+    self.assertIn(2, tree)
+
+    self.assertEqual(tree.erase_many([5, 4, 1]), 2)
+    self.assertListEqual(tree.keys_list(), [2, 3])
+
   @parameterized.named_parameters(
       dict(
           testcase_name='int_to_int',
@@ -435,6 +624,39 @@ class BtreeTest(parameterized.TestCase):
         original_ref_counts,
     )
 
+    # Bulk APIs.
+    tree = btree.BtreeMapObject2Object()
+    for _ in range(100):
+      it = tree.end()
+      for key, value in zip(keys, values):
+        it = tree.insert_hint(it, key, key)
+        it = tree.insert_hint(it, key, value)
+      # A hint of another btree is ignored.
+      tree.insert_hint(btree.BtreeMapObject2Object().end(), keys[0], keys[0])
+      tree.build_from_sorted(keys, keys)
+      tree.build_from_sorted(keys, values)
+      it = tree.begin()
+      _ = tree.iter_chunk(it, 3)
+      _ = tree.iter_chunk(it, len(keys))
+      _ = tree.items_list()
+      _ = tree.keys_list()
+      _ = tree.keys_and_values()
+      _ = tree.find_many(keys)
+      _ = tree.upper_bound_many(keys)
+      self.assertEqual(tree.erase_many(keys), len(keys))
+      tree.build_from_sorted(keys, values)
+
+    _ = it = key = value = None  # pylint: disable=unused-variable
+    self.assertListEqual(
+        [sys.getrefcount(x) for x in itertools.chain(keys, values)],
+        [x + 1 for x in original_ref_counts],
+    )
+    self.assertEqual(tree.erase_many(keys), len(keys))
+    self.assertListEqual(
+        [sys.getrefcount(x) for x in itertools.chain(keys, values)],
+        original_ref_counts,
+    )
+
 
 if __name__ == '__main__':
   absltest.main()
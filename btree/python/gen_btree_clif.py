@@ -14,295 +14,386 @@
 
 """Generates the CLIF file for B-tree."""
 
+from collections.abc import Callable
+import functools
 import itertools
-from typing import TypeAlias, Union
+import re
+import sys
 
 _TEMPLATE_HEADER = """\
 from "btree/btree.h":
   namespace `djc::btree`:
 """
 
-_TEMPLATE_SETS = """\
-    class `btree_set<{key_c_type}>::iterator` as BtreeSet{KeyType}Iterator:
-      def `operator++` as self_inc(self) -> BtreeSet{KeyType}Iterator
-      def `operator--` as self_dec(self) -> BtreeSet{KeyType}Iterator
-      def `operator*` as deref(self) -> {key_type}
-      def `operator==` as __eq__(self, rhs: BtreeSet{KeyType}Iterator) -> bool
-      def `operator!=` as __ne__(self, rhs: BtreeSet{KeyType}Iterator) -> bool
 
-    class `btree_set<{key_c_type}>::keys_view_generator` as _BtreeSet{KeyType}KeysView:  # It does not work on `object`.
+def _make_iterator_class(container: str, name: str, value_type: str) -> str:
+  """Returns the CLIF declaration of the iterator class of the container."""
+  # `next_value` returns `None` at the end, which cannot be told apart from a
+  # stored `None` unless the values are wrapped in tuples.
+  next_value_comment = (
+      ''
+      if value_type.startswith('tuple<')
+      else '  # It does not work on `object`.'
+  )
+  return f"""\
+    class `{container}::iterator` as {name}Iterator:
+      def `operator++` as self_inc(self) -> {name}Iterator
+      def `operator--` as self_dec(self) -> {name}Iterator
+      def `operator*` as deref(self) -> {value_type}
+      def next_value(self) -> NoneOr<{value_type}>{next_value_comment}
+      def `operator==` as __eq__(self, rhs: {name}Iterator) -> bool
+      def `operator!=` as __ne__(self, rhs: {name}Iterator) -> bool
+      def at_end(self) -> bool
+"""
+
+
+_TEMPLATE_SETS = (
+    _make_iterator_class(
+        'btree_set<${key_c_type}>',
+        'BtreeSet${KeyType}',
+        '${key_type}',
+    )
+    + """
+    class `btree_set<${key_c_type}>::keys_view_generator` as _BtreeSet${KeyType}KeysView:  # It does not work on `object`.
       class `btree_view` as __iter__:  # It does not work on `object`.
-        def __next__(self) -> {key_type}  # It does not work on `object`.
+        def __next__(self) -> ${key_type}  # It does not work on `object`.
 
-    class `btree_set<{key_c_type}>` as BtreeSet{KeyType}:
+    class `btree_set<${key_c_type}>` as BtreeSet${KeyType}:
       def __init__(self) -> None
       def `_clear` as clear(self) -> None
       def empty(self) -> bool
       def `not_empty` as __bool__(self) -> bool
-      def `_contains` as contains(self, key: {key_type}) -> bool
-      def `_contains` as __contains__(self, key: {key_type}) -> bool
+      def `_contains` as contains(self, key: ${key_type}) -> bool
+      def `_contains` as __contains__(self, key: ${key_type}) -> bool
       def size(self) -> int
       def `size` as __len__(self) -> int
-      def `_begin` as begin(self) -> BtreeSet{KeyType}Iterator
-      def `_end` as end(self) -> BtreeSet{KeyType}Iterator
-      def `_insert` as insert(self, key: {key_type}) -> tuple<BtreeSet{KeyType}Iterator, bool>
-      def `_erase` as erase(self, key: {key_type}) -> int
-      def remove(self, it: BtreeSet{KeyType}Iterator) -> BtreeSet{KeyType}Iterator
-      def `_find` as find(self, key: {key_type}) -> BtreeSet{KeyType}Iterator
-      def `_lower_bound` as lower_bound(self, key: {key_type}) -> BtreeSet{KeyType}Iterator
-      def `_upper_bound` as upper_bound(self, key: {key_type}) -> BtreeSet{KeyType}Iterator
+      def `_begin` as begin(self) -> BtreeSet${KeyType}Iterator
+      def `_end` as end(self) -> BtreeSet${KeyType}Iterator
+      def iter_chunk(self, it: BtreeSet${KeyType}Iterator, n: int) -> list<${key_type}>
+      def keys_list(self) -> list<${key_type}>
+      def `_insert` as insert(self, key: ${key_type}) -> tuple<BtreeSet${KeyType}Iterator, bool>
+      def `_erase` as erase(self, key: ${key_type}) -> int
+      def remove(self, it: BtreeSet${KeyType}Iterator) -> BtreeSet${KeyType}Iterator
+      def `_find` as find(self, key: ${key_type}) -> BtreeSet${KeyType}Iterator
+      def `_lower_bound` as lower_bound(self, key: ${key_type}) -> BtreeSet${KeyType}Iterator
+      def `_upper_bound` as upper_bound(self, key: ${key_type}) -> BtreeSet${KeyType}Iterator
       class `keys_view` as __iter__:  # It does not work on `object`.
-        def __next__(self) -> {key_type}  # It does not work on `object`.
-      def keys(self) -> _BtreeSet{KeyType}KeysView  # It does not work on `object`.
+        def __next__(self) -> ${key_type}  # It does not work on `object`.
+      def keys(self) -> _BtreeSet${KeyType}KeysView  # It does not work on `object`.
 
-    class `btree_multiset<{key_c_type}>::iterator` as BtreeMultiset{KeyType}Iterator:
-      def `operator++` as self_inc(self) -> BtreeMultiset{KeyType}Iterator
-      def `operator--` as self_dec(self) -> BtreeMultiset{KeyType}Iterator
-      def `operator*` as deref(self) -> {key_type}
-      def `operator==` as __eq__(self, rhs: BtreeMultiset{KeyType}Iterator) -> bool
-      def `operator!=` as __ne__(self, rhs: BtreeMultiset{KeyType}Iterator) -> bool
-
-    class `btree_multiset<{key_c_type}>::keys_view_generator` as _BtreeMultiset{KeyType}KeysView:  # It does not work on `object`.
+"""
+    + _make_iterator_class(
+        'btree_multiset<${key_c_type}>',
+        'BtreeMultiset${KeyType}',
+        '${key_type}',
+    )
+    + """
+    class `btree_multiset<${key_c_type}>::keys_view_generator` as _BtreeMultiset${KeyType}KeysView:  # It does not work on `object`.
       class `btree_view` as __iter__:  # It does not work on `object`.
-        def __next__(self) -> {key_type}  # It does not work on `object`.
+        def __next__(self) -> ${key_type}  # It does not work on `object`.
 
-    class `btree_multiset<{key_c_type}>` as BtreeMultiset{KeyType}:
+    class `btree_multiset<${key_c_type}>` as BtreeMultiset${KeyType}:
       def __init__(self) -> None
       def `_clear` as clear(self) -> None
       def empty(self) -> bool
       def `not_empty` as __bool__(self) -> bool
-      def `_contains` as contains(self, key: {key_type}) -> bool
-      def `_contains` as __contains__(self, key: {key_type}) -> bool
+      def `_contains` as contains(self, key: ${key_type}) -> bool
+      def `_contains` as __contains__(self, key: ${key_type}) -> bool
       def size(self) -> int
       def `size` as __len__(self) -> int
-      def `_begin` as begin(self) -> BtreeMultiset{KeyType}Iterator
-      def `_end` as end(self) -> BtreeMultiset{KeyType}Iterator
-      def `_insert` as insert(self, key: {key_type}) -> BtreeMultiset{KeyType}Iterator
-      def `_erase` as erase(self, key: {key_type}) -> int
-      def remove(self, it: BtreeMultiset{KeyType}Iterator) -> BtreeMultiset{KeyType}Iterator
-      def `_find` as find(self, key: {key_type}) -> BtreeMultiset{KeyType}Iterator
-      def `_lower_bound` as lower_bound(self, key: {key_type}) -> BtreeMultiset{KeyType}Iterator
-      def `_upper_bound` as upper_bound(self, key: {key_type}) -> BtreeMultiset{KeyType}Iterator
+      def `_begin` as begin(self) -> BtreeMultiset${KeyType}Iterator
+      def `_end` as end(self) -> BtreeMultiset${KeyType}Iterator
+      def iter_chunk(self, it: BtreeMultiset${KeyType}Iterator, n: int) -> list<${key_type}>
+      def keys_list(self) -> list<${key_type}>
+      def `_insert` as insert(self, key: ${key_type}) -> BtreeMultiset${KeyType}Iterator
+      def `_erase` as erase(self, key: ${key_type}) -> int
+      def remove(self, it: BtreeMultiset${KeyType}Iterator) -> BtreeMultiset${KeyType}Iterator
+      def `_find` as find(self, key: ${key_type}) -> BtreeMultiset${KeyType}Iterator
+      def `_lower_bound` as lower_bound(self, key: ${key_type}) -> BtreeMultiset${KeyType}Iterator
+      def `_upper_bound` as upper_bound(self, key: ${key_type}) -> BtreeMultiset${KeyType}Iterator
       class `keys_view` as __iter__:  # It does not work on `object`.
-        def __next__(self) -> {key_type}  # It does not work on `object`.
-      def keys(self) -> _BtreeMultiset{KeyType}KeysView  # It does not work on `object`.
+        def __next__(self) -> ${key_type}  # It does not work on `object`.
+      def keys(self) -> _BtreeMultiset${KeyType}KeysView  # It does not work on `object`.
 """
+)
 
-_TEMPLATE_MAPS = """\
-    class `btree_map<{key_c_type}, {value_c_type}>::iterator` as BtreeMap{KeyType}2{ValueType}Iterator:
-      def `operator++` as self_inc(self) -> BtreeMap{KeyType}2{ValueType}Iterator
-      def `operator--` as self_dec(self) -> BtreeMap{KeyType}2{ValueType}Iterator
-      def `operator*` as deref(self) -> tuple<{key_type}, {value_type}>
-      def `operator==` as __eq__(self, rhs: BtreeMap{KeyType}2{ValueType}Iterator) -> bool
-      def `operator!=` as __ne__(self, rhs: BtreeMap{KeyType}2{ValueType}Iterator) -> bool
-
-    class `btree_map<{key_c_type}, {value_c_type}>::keys_view_generator` as _BtreeMap{KeyType}2{ValueType}KeysView:  # It does not work on `object`.
+_TEMPLATE_MAPS = (
+    _make_iterator_class(
+        'btree_map<${key_c_type}, ${value_c_type}>',
+        'BtreeMap${KeyType}2${ValueType}',
+        'tuple<${key_type}, ${value_type}>',
+    )
+    + """
+    class `btree_map<${key_c_type}, ${value_c_type}>::keys_view_generator` as _BtreeMap${KeyType}2${ValueType}KeysView:  # It does not work on `object`.
       class `btree_view` as __iter__:  # It does not work on `object`.
-        def __next__(self) -> {key_type}  # It does not work on `object`.
+        def __next__(self) -> ${key_type}  # It does not work on `object`.
 
-    class `btree_map<{key_c_type}, {value_c_type}>::values_view_generator` as _Btreemap{KeyType}2{ValueType}ValuesView:  # It does not work on `object`.
+    class `btree_map<${key_c_type}, ${value_c_type}>::values_view_generator` as _Btreemap${KeyType}2${ValueType}ValuesView:  # It does not work on `object`.
       class `btree_view` as __iter__:  # It does not work on `object`.
-        def __next__(self) -> {value_type}  # It does not work on `object`.
+        def __next__(self) -> ${value_type}  # It does not work on `object`.
 
-    class `btree_map<{key_c_type}, {value_c_type}>::items_view_generator` as _Btreemap{KeyType}2{ValueType}ItemsView:  # It does not work on `object`.
+    class `btree_map<${key_c_type}, ${value_c_type}>::items_view_generator` as _Btreemap${KeyType}2${ValueType}ItemsView:  # It does not work on `object`.
       class `btree_view` as __iter__:  # It does not work on `object`.
-        def __next__(self) -> tuple<{key_type}, {value_type}>  # It does not work on `object`.
+        def __next__(self) -> tuple<${key_type}, ${value_type}>  # It does not work on `object`.
 
-    class `btree_map<{key_c_type}, {value_c_type}>` as BtreeMap{KeyType}2{ValueType}:
+    class `btree_map<${key_c_type}, ${value_c_type}>` as BtreeMap${KeyType}2${ValueType}:
       def __init__(self) -> None
       def `_clear` as clear(self) -> None
       def empty(self) -> bool
       def `not_empty` as __bool__(self) -> bool
-      def `_contains` as contains(self, key: {key_type}) -> bool
-      def `_contains` as __contains__(self, key: {key_type}) -> bool
+      def `_contains` as contains(self, key: ${key_type}) -> bool
+      def `_contains` as __contains__(self, key: ${key_type}) -> bool
       def size(self) -> int
       def `size` as __len__(self) -> int
-      def `_begin` as begin(self) -> BtreeMap{KeyType}2{ValueType}Iterator
-      def `_end` as end(self) -> BtreeMap{KeyType}2{ValueType}Iterator
-      def `_insert` as insert(self, value: tuple<{key_type}, {value_type}>) -> tuple<BtreeMap{KeyType}2{ValueType}Iterator, bool>
-      def `_erase` as erase(self, key: {key_type}) -> int
-      def `_erase` as __delitem__(self, key: {key_type}) -> None
-      def remove(self, it: BtreeMap{KeyType}2{ValueType}Iterator) -> BtreeMap{KeyType}2{ValueType}Iterator
-      def `_find` as find(self, key: {key_type}) -> BtreeMap{KeyType}2{ValueType}Iterator
-      def `_lower_bound` as lower_bound(self, key: {key_type}) -> BtreeMap{KeyType}2{ValueType}Iterator
-      def `_upper_bound` as upper_bound(self, key: {key_type}) -> BtreeMap{KeyType}2{ValueType}Iterator
-      def insert_or_assign(self, key: {key_type}, value: {value_type}) -> tuple<BtreeMap{KeyType}2{ValueType}Iterator, bool>
-      def `get_item` as __getitem__(self, key: {key_type}) -> {value_type}
-      def `insert_or_assign` as __setitem__(self, key: {key_type}, value: {value_type}) -> None
+      def `_begin` as begin(self) -> BtreeMap${KeyType}2${ValueType}Iterator
+      def `_end` as end(self) -> BtreeMap${KeyType}2${ValueType}Iterator
+      def iter_chunk(self, it: BtreeMap${KeyType}2${ValueType}Iterator, n: int) -> list<tuple<${key_type}, ${value_type}>>
+      def keys_list(self) -> list<${key_type}>
+      def items_list(self) -> list<tuple<${key_type}, ${value_type}>>
+      def keys_and_values(self) -> tuple<list<${key_type}>, list<${value_type}>>
+      def `_insert` as insert(self, value: tuple<${key_type}, ${value_type}>) -> tuple<BtreeMap${KeyType}2${ValueType}Iterator, bool>
+      def `_erase` as erase(self, key: ${key_type}) -> int
+      def `_erase` as __delitem__(self, key: ${key_type}) -> None
+      def remove(self, it: BtreeMap${KeyType}2${ValueType}Iterator) -> BtreeMap${KeyType}2${ValueType}Iterator
+      def `_find` as find(self, key: ${key_type}) -> BtreeMap${KeyType}2${ValueType}Iterator
+      def `_lower_bound` as lower_bound(self, key: ${key_type}) -> BtreeMap${KeyType}2${ValueType}Iterator
+      def `_upper_bound` as upper_bound(self, key: ${key_type}) -> BtreeMap${KeyType}2${ValueType}Iterator
+      def insert_or_assign(self, key: ${key_type}, value: ${value_type}) -> tuple<BtreeMap${KeyType}2${ValueType}Iterator, bool>
+      def `get_item` as __getitem__(self, key: ${key_type}) -> ${value_type}
+      def `insert_or_assign` as __setitem__(self, key: ${key_type}, value: ${value_type}) -> None
+      def insert_hint(self, hint: BtreeMap${KeyType}2${ValueType}Iterator, key: ${key_type}, value: ${value_type}) -> BtreeMap${KeyType}2${ValueType}Iterator
+      def build_from_sorted(self, keys: list<${key_type}>, values: list<${value_type}>) -> None
+      def find_many(self, keys: list<${key_type}>) -> list<${value_type}>
+      def upper_bound_many(self, keys: list<${key_type}>) -> list<NoneOr<tuple<${key_type}, ${value_type}>>>
+      def erase_many(self, keys: list<${key_type}>) -> int
       class `keys_view` as __iter__:  # It does not work on `object`.
-        def __next__(self) -> {key_type}  # It does not work on `object`.
-      def keys(self) -> _BtreeMap{KeyType}2{ValueType}KeysView  # It does not work on `object`.
-      def values(self) -> _Btreemap{KeyType}2{ValueType}ValuesView  # It does not work on `object`.
-      def items(self) -> _Btreemap{KeyType}2{ValueType}ItemsView  # It does not work on `object`.
-
-    class `btree_multimap<{key_c_type}, {value_c_type}>::iterator` as BtreeMultimap{KeyType}2{ValueType}Iterator:
-      def `operator++` as self_inc(self) -> BtreeMultimap{KeyType}2{ValueType}Iterator
-      def `operator--` as self_dec(self) -> BtreeMultimap{KeyType}2{ValueType}Iterator
-      def `operator*` as deref(self) -> tuple<{key_type}, {value_type}>
-      def `operator==` as __eq__(self, rhs: BtreeMultimap{KeyType}2{ValueType}Iterator) -> bool
-      def `operator!=` as __ne__(self, rhs: BtreeMultimap{KeyType}2{ValueType}Iterator) -> bool
-
-    class `btree_multimap<{key_c_type}, {value_c_type}>::keys_view_generator` as _BtreeMultimap{KeyType}2{ValueType}KeysView:  # It does not work on `object`.
+        def __next__(self) -> ${key_type}  # It does not work on `object`.
+      def keys(self) -> _BtreeMap${KeyType}2${ValueType}KeysView  # It does not work on `object`.
+      def values(self) -> _Btreemap${KeyType}2${ValueType}ValuesView  # It does not work on `object`.
+      def items(self) -> _Btreemap${KeyType}2${ValueType}ItemsView  # It does not work on `object`.
+
+"""
+    + _make_iterator_class(
+        'btree_multimap<${key_c_type}, ${value_c_type}>',
+        'BtreeMultimap${KeyType}2${ValueType}',
+        'tuple<${key_type}, ${value_type}>',
+    )
+    + """
+    class `btree_multimap<${key_c_type}, ${value_c_type}>::keys_view_generator` as _BtreeMultimap${KeyType}2${ValueType}KeysView:  # It does not work on `object`.
       class `btree_view` as __iter__:  # It does not work on `object`.
-        def __next__(self) -> {key_type}  # It does not work on `object`.
+        def __next__(self) -> ${key_type}  # It does not work on `object`.
 
-    class `btree_multimap<{key_c_type}, {value_c_type}>::values_view_generator` as _BtreeMultimap{KeyType}2{ValueType}ValuesView:  # It does not work on `object`.
+    class `btree_multimap<${key_c_type}, ${value_c_type}>::values_view_generator` as _BtreeMultimap${KeyType}2${ValueType}ValuesView:  # It does not work on `object`.
       class `btree_view` as __iter__:  # It does not work on `object`.
-        def __next__(self) -> {value_type}  # It does not work on `object`.
+        def __next__(self) -> ${value_type}  # It does not work on `object`.
 
-    class `btree_multimap<{key_c_type}, {value_c_type}>::items_view_generator` as _BtreeMultimap{KeyType}2{ValueType}ItemsView:  # It does not work on `object`.
+    class `btree_multimap<${key_c_type}, ${value_c_type}>::items_view_generator` as _BtreeMultimap${KeyType}2${ValueType}ItemsView:  # It does not work on `object`.
       class `btree_view` as __iter__:  # It does not work on `object`.
-        def __next__(self) -> tuple<{key_type}, {value_type}>  # It does not work on `object`.
+        def __next__(self) -> tuple<${key_type}, ${value_type}>  # It does not work on `object`.
 
-    class `btree_multimap<{key_c_type}, {value_c_type}>` as BtreeMultimap{KeyType}2{ValueType}:
+    class `btree_multimap<${key_c_type}, ${value_c_type}>` as BtreeMultimap${KeyType}2${ValueType}:
       def __init__(self) -> None
       def `_clear` as clear(self) -> None
       def empty(self) -> bool
       def `not_empty` as __bool__(self) -> bool
-      def `_contains` as contains(self, key: {key_type}) -> bool
-      def `_contains` as __contains__(self, key: {key_type}) -> bool
+      def `_contains` as contains(self, key: ${key_type}) -> bool
+      def `_contains` as __contains__(self, key: ${key_type}) -> bool
       def size(self) -> int
       def `size` as __len__(self) -> int
-      def `_begin` as begin(self) -> BtreeMultimap{KeyType}2{ValueType}Iterator
-      def `_end` as end(self) -> BtreeMultimap{KeyType}2{ValueType}Iterator
-      def `_insert` as insert(self, value: tuple<{key_type}, {value_type}>) -> BtreeMultimap{KeyType}2{ValueType}Iterator
-      def `_erase` as erase(self, key: {key_type}) -> int
-      def remove(self, it: BtreeMultimap{KeyType}2{ValueType}Iterator) -> BtreeMultimap{KeyType}2{ValueType}Iterator
-      def `_find` as find(self, key: {key_type}) -> BtreeMultimap{KeyType}2{ValueType}Iterator
-      def `_lower_bound` as lower_bound(self, key: {key_type}) -> BtreeMultimap{KeyType}2{ValueType}Iterator
-      def `_upper_bound` as upper_bound(self, key: {key_type}) -> BtreeMultimap{KeyType}2{ValueType}Iterator
+      def `_begin` as begin(self) -> BtreeMultimap${KeyType}2${ValueType}Iterator
+      def `_end` as end(self) -> BtreeMultimap${KeyType}2${ValueType}Iterator
+      def iter_chunk(self, it: BtreeMultimap${KeyType}2${ValueType}Iterator, n: int) -> list<tuple<${key_type}, ${value_type}>>
+      def keys_list(self) -> list<${key_type}>
+      def items_list(self) -> list<tuple<${key_type}, ${value_type}>>
+      def keys_and_values(self) -> tuple<list<${key_type}>, list<${value_type}>>
+      def `_insert` as insert(self, value: tuple<${key_type}, ${value_type}>) -> BtreeMultimap${KeyType}2${ValueType}Iterator
+      def `_erase` as erase(self, key: ${key_type}) -> int
+      def remove(self, it: BtreeMultimap${KeyType}2${ValueType}Iterator) -> BtreeMultimap${KeyType}2${ValueType}Iterator
+      def `_find` as find(self, key: ${key_type}) -> BtreeMultimap${KeyType}2${ValueType}Iterator
+      def `_lower_bound` as lower_bound(self, key: ${key_type}) -> BtreeMultimap${KeyType}2${ValueType}Iterator
+      def `_upper_bound` as upper_bound(self, key: ${key_type}) -> BtreeMultimap${KeyType}2${ValueType}Iterator
       class `keys_view` as __iter__:  # It does not work on `object`.
-        def __next__(self) -> {key_type}  # It does not work on `object`.
-      def keys(self) -> _BtreeMultimap{KeyType}2{ValueType}KeysView  # It does not work on `object`.
-      def values(self) -> _BtreeMultimap{KeyType}2{ValueType}ValuesView  # It does not work on `object`.
-      def items(self) -> _BtreeMultimap{KeyType}2{ValueType}ItemsView  # It does not work on `object`.
+        def __next__(self) -> ${key_type}  # It does not work on `object`.
+      def keys(self) -> _BtreeMultimap${KeyType}2${ValueType}KeysView  # It does not work on `object`.
+      def values(self) -> _BtreeMultimap${KeyType}2${ValueType}ValuesView  # It does not work on `object`.
+      def items(self) -> _BtreeMultimap${KeyType}2${ValueType}ItemsView  # It does not work on `object`.
 """
+)
 
 _ELEMENTARY_TYPES = (int, float, str)
-_ElementaryTypes: TypeAlias = Union[object, *_ELEMENTARY_TYPES]
-
-_MAX_KEY_TUPLE_LEN = 3
-
-
-def _convert_to_c_type(tp: type[_ElementaryTypes]) -> str:
-  if tp is float:
-    return 'double'
-  if tp is str:
-    return 'std::string'
-  if tp is object:
-    return 'PyObject*'
-  return tp.__name__
-
-
-def _get_c_type_repr(types: tuple[type[_ElementaryTypes], ...]) -> str:
-  match len(types):
-    case 1:
-      return _convert_to_c_type(types[0])
-    case 2:
-      return f'std::pair<{", ".join(_convert_to_c_type(tp) for tp in types)}>'
-    case _:
-      return f'std::tuple<{", ".join(_convert_to_c_type(tp) for tp in types)}>'
-
 
-def _get_type_repr(types: tuple[type[_ElementaryTypes], ...]) -> str:
-  match len(types):
-    case 1:
-      return types[0].__name__
-    case 2:
-      return f'tuple<{", ".join(tp.__name__ for tp in types)}>'
-    case _:
-      return f'`std::tuple` as tuple<{", ".join(tp.__name__ for tp in types)} >'
-
-
-def _get_capitalized_type_repr(
-    types: tuple[type[_ElementaryTypes], ...]
-) -> str:
+# All the key types to generate sets and maps for, up to 3 elements in tuples.
+# - The type `float` is not considered as keys since it will lose precision
+#   after calculation.
+# - Cannot use the namespace qualified type `std::string` in the template
+#   argument `std::tuple<...>` due to a known PyCLIF bug.
+_VALID_KEY_TUPLES = (
+    (int,),
+    (str,),
+    (int, int),
+    (int, str),
+    (str, int),
+    (str, str),
+    (int, int, int),
+)
+
+# Target node sizes in bytes of the extra `int` to `int` maps for fanout tuning.
+# The default node size of absl is 256 bytes.
+_TARGET_NODE_SIZES = (128, 512, 1024)
+
+
+_C_TYPE_MAP = {
+    float: 'double',
+    str: 'std::string',
+    object: 'PyObject*',
+    int: 'int',
+}
+
+
+def _convert_to_c_type(tp: type) -> str:
+  return _C_TYPE_MAP[tp]
+
+
+@functools.cache
+def _get_c_type_repr(types: tuple[type, ...]) -> str:
+  if len(types) == 1:
+    return _convert_to_c_type(types[0])
+  if len(types) == 2:
+    return f'std::pair<{", ".join(_convert_to_c_type(tp) for tp in types)}>'
+  return f'std::tuple<{", ".join(_convert_to_c_type(tp) for tp in types)}>'
+
+
+@functools.cache
+def _get_type_repr(types: tuple[type, ...]) -> str:
+  if len(types) == 1:
+    return types[0].__name__
+  if len(types) == 2:
+    return f'tuple<{", ".join(tp.__name__ for tp in types)}>'
+  return f'`std::tuple` as tuple<{", ".join(tp.__name__ for tp in types)} >'
+
+
+@functools.cache
+def _get_capitalized_type_repr(types: tuple[type, ...]) -> str:
   return ''.join(tp.__name__.capitalize() for tp in types)
 
 
-# Cannot use the namespace qualified type `std::string` in the template argument
-# `std::tuple<...>` due to a known PyCLIF bug.
-def _is_clif_bug_type(types: tuple[type[_ElementaryTypes], ...]) -> bool:
-  return len(types) > 2 and str in types
+_UNSUPPORTED_LINE_PATTERN = re.compile(
+    r'^.*# It does not work on `object`\.$\n?', re.MULTILINE
+)
 
 
 def _remove_unsupported_lines(text: str) -> str:
-  lines = text.split('\n')
-  lines = [
-      line
-      for line in lines
-      if not line.endswith('# It does not work on `object`.')
-  ]
-  return '\n'.join(lines)
+  return _UNSUPPORTED_LINE_PATTERN.sub('', text)
 
 
-def main() -> None:
-  print(_TEMPLATE_HEADER)
-
-  for key_tuple_len in range(1, _MAX_KEY_TUPLE_LEN + 1):
-    # The type `float` is not considered as keys since it will lose precision
-    # after calculation.
-    for key_types in (
-        types
-        for types in itertools.product(*((_ELEMENTARY_TYPES,) * key_tuple_len))
-        if not _is_clif_bug_type(types) and float not in types
-    ):
-      print(
-          _TEMPLATE_SETS.format(
-              key_type=_get_type_repr(key_types),
-              key_c_type=_get_c_type_repr(key_types),
-              KeyType=_get_capitalized_type_repr(key_types),
-          )
+def _compile_template(template: str) -> Callable[..., str]:
+  """Compiles the template into a function formatting it as an f-string."""
+  names = dict.fromkeys(re.findall(r'\$\{(\w+)\}', template))
+  body = re.sub(
+      r'\$\{\{(\w+)\}\}',
+      r'{\1}',
+      template.replace('{', '{{').replace('}', '}}'),
+  )
+  source = f'lambda *, {", ".join(names)}: f{body!r}'
+  return eval(source)  # pylint: disable=eval-used
+
+
+_COMPILED_SETS = _compile_template(_TEMPLATE_SETS)
+_COMPILED_MAPS = _compile_template(_TEMPLATE_MAPS)
+
+# Templates to render when `object` is involved, with the unsupported lines
+# removed once in advance.
+_COMPILED_SETS_OBJECT = _compile_template(
+    _remove_unsupported_lines(_TEMPLATE_SETS)
+)
+
+# All maps involving `object` hold `object` values, so the value placeholders
+# are substituted in advance and only the key ones are left.
+_COMPILED_MAPS_OBJECT_VALUE = _compile_template(
+    _remove_unsupported_lines(_TEMPLATE_MAPS)
+    .replace('${value_type}', _get_type_repr((object,)))
+    .replace('${value_c_type}', _get_c_type_repr((object,)))
+    .replace('${ValueType}', _get_capitalized_type_repr((object,)))
+)
+
+# The all-`object` containers only depend on constants, so they are rendered
+# once in advance.
+_RENDERED_SETS_OBJECT = _COMPILED_SETS_OBJECT(
+    key_type=_get_type_repr((object,)),
+    key_c_type=_get_c_type_repr((object,)),
+    KeyType=_get_capitalized_type_repr((object,)),
+)
+_RENDERED_MAPS_OBJECT = _COMPILED_MAPS_OBJECT_VALUE(
+    key_type=_get_type_repr((object,)),
+    key_c_type=_get_c_type_repr((object,)),
+    KeyType=_get_capitalized_type_repr((object,)),
+)
+
+
+def _generate_clif() -> str:
+  out = [_TEMPLATE_HEADER]
+
+  for key_types in _VALID_KEY_TUPLES:
+    key_reprs = dict(
+        key_type=_get_type_repr(key_types),
+        key_c_type=_get_c_type_repr(key_types),
+        KeyType=_get_capitalized_type_repr(key_types),
+    )
+    out.append(_COMPILED_SETS(**key_reprs))
+    out.append(_COMPILED_MAPS_OBJECT_VALUE(**key_reprs))
+
+  elementary_key_reprs = [
+      dict(
+          key_type=_get_type_repr((tp,)),
+          key_c_type=_get_c_type_repr((tp,)),
+          KeyType=_get_capitalized_type_repr((tp,)),
       )
-      print(
-          _remove_unsupported_lines(
-              _TEMPLATE_MAPS.format(
-                  key_type=_get_type_repr(key_types),
-                  key_c_type=_get_c_type_repr(key_types),
-                  KeyType=_get_capitalized_type_repr(key_types),
-                  value_type=_get_type_repr((object,)),
-                  value_c_type=_get_c_type_repr((object,)),
-                  ValueType=_get_capitalized_type_repr((object,)),
-              )
-          )
+      for tp in _ELEMENTARY_TYPES
+      if tp is not float
+  ]
+  elementary_value_reprs = [
+      dict(
+          value_type=_get_type_repr((tp,)),
+          value_c_type=_get_c_type_repr((tp,)),
+          ValueType=_get_capitalized_type_repr((tp,)),
       )
-
-  for key_type, value_type in itertools.product(
-      (tp for tp in _ELEMENTARY_TYPES if tp is not float),
-      _ELEMENTARY_TYPES,
+      for tp in _ELEMENTARY_TYPES
+  ]
+  for key_reprs, value_reprs in itertools.product(
+      elementary_key_reprs, elementary_value_reprs
   ):
-    print(
-        _TEMPLATE_MAPS.format(
-            key_type=_get_type_repr((key_type,)),
-            key_c_type=_get_c_type_repr((key_type,)),
-            KeyType=_get_capitalized_type_repr((key_type,)),
-            value_type=_get_type_repr((value_type,)),
-            value_c_type=_get_c_type_repr((value_type,)),
-            ValueType=_get_capitalized_type_repr((value_type,)),
+    out.append(_COMPILED_MAPS(**key_reprs, **value_reprs))
+
+  for node_size in _TARGET_NODE_SIZES:
+    out.append(
+        _COMPILED_MAPS(
+            key_type=_get_type_repr((int,)),
+            key_c_type=_get_c_type_repr((int,)),
+            KeyType=_get_capitalized_type_repr((int,)),
+            value_type=_get_type_repr((int,)),
+            # The node size is passed within the comparator, which is the third
+            # template argument following the value type.
+            value_c_type=(
+                f'{_get_c_type_repr((int,))}, '
+                f'target_node_size<less<int>, {node_size}>'
+            ),
+            ValueType=f'{_get_capitalized_type_repr((int,))}NodeSize{node_size}',
         )
     )
 
-  print(
-      _remove_unsupported_lines(
-          _TEMPLATE_SETS.format(
-              key_type=_get_type_repr((object,)),
-              key_c_type=_get_c_type_repr((object,)),
-              KeyType=_get_capitalized_type_repr((object,)),
-          )
-      )
-  )
-  print(
-      _remove_unsupported_lines(
-          _TEMPLATE_MAPS.format(
-              key_type=_get_type_repr((object,)),
-              key_c_type=_get_c_type_repr((object,)),
-              KeyType=_get_capitalized_type_repr((object,)),
-              value_type=_get_type_repr((object,)),
-              value_c_type=_get_c_type_repr((object,)),
-              ValueType=_get_capitalized_type_repr((object,)),
-          )
-      )
-  )
+  out.append(_RENDERED_SETS_OBJECT)
+  out.append(_RENDERED_MAPS_OBJECT)
+
+  return '\n'.join(out) + '\n'
+
+
+# The generated text only depends on module constants, so it is generated once
+# in advance.
+_CLIF_TEXT = _generate_clif()
+
+
+def main() -> None:
+  sys.stdout.buffer.write(_CLIF_TEXT.encode('ascii'))
 
 
 if __name__ == '__main__':